@@ -2,8 +2,14 @@
 // Analyzes memory usage of a process and its children, displaying as a tree structure
 
 use clap::Parser;
-use std::collections::HashMap;
-use sysinfo::System;
+use std::borrow::Cow;
+use std::collections::{HashMap, HashSet};
+use std::fmt::{self, Write};
+use std::io::{self, IsTerminal, Write as _};
+use std::thread;
+use std::time::Duration;
+#[cfg(not(target_os = "linux"))]
+use sysinfo::{ProcessRefreshKind, System, UpdateKind};
 
 // ANSI color codes for cross-platform colored output
 mod colors {
@@ -13,15 +19,49 @@ mod colors {
     // Foreground colors
     pub const CYAN: &str = "\x1b[36m";
     
-    // Background colors - light gray background
-    pub const BG_LIGHT_GRAY: &str = "\x1b[47m";  // Light gray background
-    
-    // Foreground colors - dark gray for contrast
-    pub const DARK_GRAY: &str = "\x1b[30m";  // Dark gray foreground
+    // Highlight for top memory consumers, precombined so nothing is built per node:
+    // dark gray foreground (30) on a light gray background (47)
+    pub const HIGHLIGHT: &str = "\x1b[30m\x1b[47m";
     
     // Styles - removed bold for cleaner output
     // pub const BOLD: &str = "\1b[1m"; // Removed
     
+    // Escape sequences for one output mode, chosen once so printing never branches on it
+    pub struct Palette {
+        pub cyan: &'static str,
+        pub highlight: &'static str,
+        pub reset: &'static str,
+        pub tree_separator: &'static str, // Written between consecutive trees
+        // Cursor control for repainting watch-mode frames in place
+        pub clear_screen: &'static str,
+        pub cursor_home: &'static str,
+        pub clear_line: &'static str, // Clear to end of line
+        pub clear_below: &'static str, // Clear from the cursor to the end of the screen
+    }
+    
+    pub const COLORED: Palette = Palette {
+        cyan: CYAN,
+        highlight: HIGHLIGHT,
+        reset: RESET,
+        tree_separator: "\n",
+        clear_screen: "\x1b[2J",
+        cursor_home: "\x1b[H",
+        clear_line: "\x1b[K",
+        clear_below: "\x1b[J",
+    };
+    
+    // No escape sequences at all: watch-mode frames are simply written one after another
+    pub const PLAIN: Palette = Palette {
+        cyan: "",
+        highlight: "",
+        reset: "",
+        tree_separator: "\n============================================================\n",
+        clear_screen: "",
+        cursor_home: "",
+        clear_line: "",
+        clear_below: "",
+    };
+    
     // Check if colors should be used
     pub fn should_use_colors(no_color_flag: bool) -> bool {
         // Check if NO_COLOR environment variable is set
@@ -40,6 +80,287 @@ mod colors {
     // }
 }
 
+// Direct procfs access on Linux, avoiding the extra files sysinfo reads per process
+#[cfg(target_os = "linux")]
+mod procfs {
+    use std::collections::HashMap;
+    use std::ffi::CStr;
+    use std::fs::{self, File};
+    use std::io::{self, Write as _};
+    use std::os::fd::{AsRawFd, FromRawFd};
+    use std::os::unix::fs::FileExt;
+    use std::thread;
+    
+    // Below this many processes, spawning reader threads costs more than it saves
+    const PARALLEL_MIN_PROCESSES: usize = 256;
+    
+    // Upper bound on reader threads; procfs reads stop scaling beyond a few cores
+    const MAX_READERS: usize = 4;
+    
+    // Per-reader buffer for stat lines, which stay well under 1 KiB
+    const STAT_BUF_SIZE: usize = 4096;
+    
+    // One process read from procfs
+    pub struct Entry {
+        pub pid: u32,
+        pub stat: Stat,
+    }
+    
+    // A PID to read this pass, with its stat descriptor if one is open
+    struct Slot {
+        pid: u32,
+        file: Option<File>,
+        keep: bool, // keep the descriptor open for the next pass
+    }
+    
+    // Fields read from /proc/<pid>/stat
+    pub struct Stat {
+        pub name: String,
+        pub parent_pid: Option<u32>,
+        pub rss: u64, // Resident Set Size in bytes
+    }
+    
+    // List the PIDs currently present under /proc
+    pub fn list_pids() -> io::Result<Vec<u32>> {
+        let mut pids = Vec::new();
+        for entry in fs::read_dir("/proc")? {
+            // Only numeric directory names are processes
+            if let Some(pid) = entry.ok().and_then(|e| e.file_name().to_str().and_then(|n| n.parse().ok())) {
+                pids.push(pid);
+            }
+        }
+        Ok(pids)
+    }
+    
+    // Read every listed process, handing each one to `visit` as soon as it is parsed and
+    // fanning out over a few threads on busy systems. Stat descriptors kept in `stat_files`
+    // by the previous pass are re-read in place (pread at offset 0), and the map is left
+    // holding up to `cache_limit` of this pass's descriptors
+    pub fn read_processes(pids: &[u32], stat_files: &mut HashMap<u32, File>, cache_limit: usize, mut visit: impl FnMut(Entry)) -> io::Result<()> {
+        // Held open for the whole pass so every stat file is opened relative to it
+        let proc_dir = File::open("/proc")?;
+        let proc_dir = &proc_dir;
+        let page_size = page_size();
+        
+        // Take over descriptors of PIDs that are still listed; clearing closes the rest
+        let mut slots: Vec<Slot> = pids
+            .iter()
+            .enumerate()
+            .map(|(i, &pid)| Slot { pid, file: stat_files.remove(&pid), keep: i < cache_limit })
+            .collect();
+        stat_files.clear();
+        
+        let readers = thread::available_parallelism().map_or(1, |n| n.get()).min(MAX_READERS);
+        if readers < 2 || slots.len() < PARALLEL_MIN_PROCESSES {
+            read_chunk(proc_dir, &mut slots, page_size, &mut visit);
+        } else {
+            let chunk_size = slots.len().div_ceil(readers);
+            thread::scope(|scope| {
+                let handles: Vec<_> = slots
+                    .chunks_mut(chunk_size)
+                    .map(|chunk| scope.spawn(move || {
+                        let mut entries = Vec::with_capacity(chunk.len());
+                        read_chunk(proc_dir, chunk, page_size, &mut |entry| entries.push(entry));
+                        entries
+                    }))
+                    .collect();
+                // Hand over each reader's entries as it is joined instead of concatenating them first
+                for handle in handles {
+                    handle.join().unwrap_or_else(|panic| std::panic::resume_unwind(panic)).into_iter().for_each(&mut visit);
+                }
+            });
+        }
+        
+        stat_files.extend(slots.into_iter().filter_map(|slot| Some((slot.pid, slot.file?))));
+        Ok(())
+    }
+    
+    // Read a run of PIDs in order, skipping processes that have exited meanwhile
+    fn read_chunk(proc_dir: &File, slots: &mut [Slot], page_size: u64, visit: &mut impl FnMut(Entry)) {
+        // Path and read buffers are reused for every PID in the chunk
+        let mut path = Vec::with_capacity(32);
+        let mut buf = [0u8; STAT_BUF_SIZE];
+        for slot in slots.iter_mut() {
+            let stat = read_stat(proc_dir, slot, page_size, &mut path, &mut buf);
+            if !slot.keep {
+                slot.file = None;
+            }
+            if let Some(stat) = stat {
+                visit(Entry { pid: slot.pid, stat });
+            }
+        }
+    }
+    
+    // Cache at most half the soft descriptor limit, leaving room for everything else
+    pub fn stat_cache_limit() -> usize {
+        let mut limit = libc::rlimit { rlim_cur: 0, rlim_max: 0 };
+        // SAFETY: getrlimit only writes into the struct it is given
+        if unsafe { libc::getrlimit(libc::RLIMIT_NOFILE, &mut limit) } != 0 {
+            return 0;
+        }
+        usize::try_from(limit.rlim_cur / 2).unwrap_or(usize::MAX)
+    }
+    
+    // Open "<pid>/stat" relative to the open /proc directory, so the kernel resolves
+    // two path components per process instead of walking from the root each time
+    fn open_stat(proc_dir: &File, pid: u32, path: &mut Vec<u8>) -> Option<File> {
+        path.clear();
+        write!(path, "{}/stat\0", pid).ok()?;
+        let path = CStr::from_bytes_with_nul(path).ok()?;
+        // SAFETY: path is NUL-terminated and proc_dir is an open directory descriptor
+        let fd = unsafe { libc::openat(proc_dir.as_raw_fd(), path.as_ptr(), libc::O_RDONLY | libc::O_CLOEXEC) };
+        if fd < 0 {
+            return None;
+        }
+        // SAFETY: fd was just returned by openat and nothing else owns it
+        Some(unsafe { File::from_raw_fd(fd) })
+    }
+    
+    // System page size, used to convert RSS pages to bytes
+    fn page_size() -> u64 {
+        // SAFETY: sysconf has no preconditions and only reads system configuration
+        let size = unsafe { libc::sysconf(libc::_SC_PAGESIZE) };
+        if size > 0 { size as u64 } else { 4096 }
+    }
+    
+    // Read name, parent PID and RSS for a process; None if it has gone away.
+    // A single pread(2) returns the whole line, which procfs generates atomically
+    fn read_stat(proc_dir: &File, slot: &mut Slot, page_size: u64, path: &mut Vec<u8>, buf: &mut [u8]) -> Option<Stat> {
+        if let Some(file) = &slot.file {
+            match file.read_at(buf, 0) {
+                Ok(len) if len > 0 => return parse_stat(&buf[..len], page_size),
+                // The cached descriptor belongs to a process that exited (ESRCH),
+                // possibly with its PID since reused, so open the current one
+                _ => slot.file = None,
+            }
+        }
+        
+        let file = open_stat(proc_dir, slot.pid, path)?;
+        let len = file.read_at(buf, 0).ok()?;
+        slot.file = Some(file);
+        parse_stat(&buf[..len], page_size)
+    }
+    
+    // Parse the stat line: "pid (comm) state ppid ... rss ..."
+    fn parse_stat(data: &[u8], page_size: u64) -> Option<Stat> {
+        // comm may itself contain spaces or parentheses, so use the last ')'
+        let open = data.iter().position(|&b| b == b'(')?;
+        let close = data.iter().rposition(|&b| b == b')')?;
+        let name = String::from_utf8_lossy(data.get(open + 1..close)?).into_owned();
+        
+        // Remaining fields start at field 3 (state): ppid is field 4, rss is field 24.
+        // Tokenize the raw bytes in place; only the two fields we need are converted
+        let mut fields = data.get(close + 1..)?
+            .split(|b| b.is_ascii_whitespace())
+            .filter(|field| !field.is_empty());
+        let ppid = u32::try_from(parse_u64(fields.nth(1)?)?).ok()?;
+        let rss_pages = parse_u64(fields.nth(19)?)?;
+        
+        Some(Stat {
+            name,
+            parent_pid: if ppid == 0 { None } else { Some(ppid) },
+            rss: rss_pages * page_size,
+        })
+    }
+    
+    // Parse an unsigned decimal field without going through str
+    fn parse_u64(field: &[u8]) -> Option<u64> {
+        if field.is_empty() {
+            return None;
+        }
+        field.iter().try_fold(0u64, |value, &b| {
+            if b.is_ascii_digit() {
+                value.checked_mul(10)?.checked_add(u64::from(b - b'0'))
+            } else {
+                None
+            }
+        })
+    }
+    
+    // Read the NUL-separated command line, joined with spaces; None for kernel threads
+    pub fn read_cmdline(pid: u32) -> Option<String> {
+        let data = fs::read(format!("/proc/{}/cmdline", pid)).ok()?;
+        let data = data.strip_suffix(&[0]).unwrap_or(&data);
+        if data.is_empty() {
+            return None;
+        }
+        let args: Vec<String> = data
+            .split(|&b| b == 0)
+            .map(|arg| String::from_utf8_lossy(arg).into_owned())
+            .collect();
+        Some(args.join(" "))
+    }
+    
+    #[cfg(test)]
+    mod tests {
+        use super::*;
+        
+        // A /proc/<pid>/stat line laid out like the kernel's, with comm, ppid (field 4) and rss (field 24) filled in
+        fn stat_line(comm: &str, ppid: &str, rss: &str) -> String {
+            format!("4321 ({}) S {} 4321 4321 0 -1 4194560 812 0 0 0 5 3 0 0 20 0 1 0 123456 10485760 {} 18446744073709551615 1 1 0 0 0 0 0 0 0 0 0 0 17 0 0 0 0 0 0\n", comm, ppid, rss)
+        }
+        
+        #[test]
+        fn parses_name_parent_and_rss_in_bytes() {
+            let stat = parse_stat(stat_line("python3", "42", "321").as_bytes(), 4096).unwrap();
+            assert_eq!(stat.name, "python3");
+            assert_eq!(stat.parent_pid, Some(42));
+            assert_eq!(stat.rss, 321 * 4096);
+            
+            // RSS is reported in pages, so the byte count follows the page size
+            let stat = parse_stat(stat_line("python3", "42", "321").as_bytes(), 16384).unwrap();
+            assert_eq!(stat.rss, 321 * 16384);
+        }
+        
+        #[test]
+        fn comm_may_contain_parentheses_and_spaces() {
+            let stat = parse_stat(stat_line("a) (b c", "7", "10").as_bytes(), 4096).unwrap();
+            assert_eq!(stat.name, "a) (b c");
+            assert_eq!(stat.parent_pid, Some(7));
+            assert_eq!(stat.rss, 10 * 4096);
+            
+            let stat = parse_stat(stat_line("name)", "7", "10").as_bytes(), 4096).unwrap();
+            assert_eq!(stat.name, "name)");
+            assert_eq!(stat.rss, 10 * 4096);
+        }
+        
+        #[test]
+        fn parent_pid_zero_means_no_parent() {
+            let stat = parse_stat(stat_line("systemd", "0", "100").as_bytes(), 4096).unwrap();
+            assert_eq!(stat.parent_pid, None);
+        }
+        
+        #[test]
+        fn truncated_lines_are_rejected() {
+            let line = stat_line("python3", "42", "321");
+            let before_rss = line.find(" 321 ").unwrap();
+            assert!(parse_stat(&line.as_bytes()[..before_rss], 4096).is_none());
+            assert!(parse_stat(b"4321 (python3", 4096).is_none());
+            assert!(parse_stat(b"4321 (python3) S", 4096).is_none());
+            assert!(parse_stat(b"", 4096).is_none());
+        }
+        
+        #[test]
+        fn non_numeric_fields_are_rejected() {
+            assert!(parse_stat(stat_line("python3", "x42", "321").as_bytes(), 4096).is_none());
+            assert!(parse_stat(stat_line("python3", "42", "-321").as_bytes(), 4096).is_none());
+            assert!(parse_stat(stat_line("python3", "42", "3a1").as_bytes(), 4096).is_none());
+            // A ppid that does not fit a PID
+            assert!(parse_stat(stat_line("python3", "4294967296", "321").as_bytes(), 4096).is_none());
+        }
+        
+        #[test]
+        fn parse_u64_accepts_only_plain_decimals() {
+            assert_eq!(parse_u64(b"0"), Some(0));
+            assert_eq!(parse_u64(b"18446744073709551615"), Some(u64::MAX));
+            assert_eq!(parse_u64(b"18446744073709551616"), None);
+            assert_eq!(parse_u64(b""), None);
+            assert_eq!(parse_u64(b"+1"), None);
+            assert_eq!(parse_u64(b"1 "), None);
+        }
+    }
+}
+
 // Command line arguments
 #[derive(Parser, Debug)]
 #[clap(
@@ -65,36 +386,34 @@ struct Args {
     #[clap(long)]
     no_color: bool,
     
+    /// Emit the process trees as JSON instead of formatted text
+    #[clap(long)]
+    json: bool,
+    
     /// Watch mode - continuously update every N seconds
-    #[clap(short, long)]
+    #[clap(short, long, value_parser = clap::value_parser!(u64).range(1..))]
     watch: Option<u64>,
 }
 
 // Process information structure
-#[derive(Debug, Clone)]
+#[derive(Debug)]
 struct ProcessInfo {
     pid: u32,
-    name: String,
+    name: Box<str>, // Boxed: names and args never grow once captured
     rss: u64, // Resident Set Size in bytes
     parent_pid: Option<u32>,
     children: Vec<u32>,
-    is_max_memory: bool,
-    is_second_max_memory: bool,
-    is_third_max_memory: bool,
-    args: Option<String>, // Command line arguments
+    args: Option<Box<str>>, // Command line arguments
 }
 
 impl ProcessInfo {
     fn new(pid: u32, name: String, rss: u64, parent_pid: Option<u32>) -> Self {
         ProcessInfo {
             pid,
-            name,
+            name: name.into_boxed_str(),
             rss,
             parent_pid,
             children: Vec::new(),
-            is_max_memory: false,
-            is_second_max_memory: false,
-            is_third_max_memory: false,
             args: None,
         }
     }
@@ -104,92 +423,292 @@ impl ProcessInfo {
     }
 }
 
+// Memory value rendered as MB/GB with optional color codes, written straight into
+// the output instead of through intermediate Strings
+struct MemoryDisplay {
+    bytes: u64,
+    color: &'static str,
+    reset: &'static str,
+}
+
+impl fmt::Display for MemoryDisplay {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.write_str(self.color)?;
+        if self.bytes == 0 {
+            f.write_str("0B")?;
+        } else {
+            let mb = self.bytes as f64 / (1024.0 * 1024.0);
+            let gb = mb / 1024.0;
+            
+            if gb >= 1.0 {
+                write!(f, "{:.1}GB", gb)?;
+            } else {
+                write!(f, "{:.1}MB", mb)?;
+            }
+        }
+        f.write_str(self.reset)
+    }
+}
+
+// One line of a rendered tree, recorded in display order
+struct TreeRow {
+    pid: u32,
+    depth: usize,
+    is_last: bool, // Last child of its parent
+}
+
+// Results of a single walk over one process tree
+struct TreeStats {
+    rows: Vec<TreeRow>, // Depth-first display order, root first
+    total_memory: u64,
+    top_rss: [u64; 3], // Three largest distinct RSS values, descending; 0 when absent
+    pid_width: usize,
+    name_width: usize,
+}
+
+impl TreeStats {
+    // Place of an RSS value among the tree's three largest (1-3), or 0 if it is not one of them
+    fn memory_rank(&self, rss: u64) -> u8 {
+        let [max_rss, second_max_rss, third_max_rss] = self.top_rss;
+        if rss == max_rss {
+            1
+        } else if rss == second_max_rss && second_max_rss > 0 {
+            2
+        } else if rss == third_max_rss && third_max_rss > 0 {
+            3
+        } else {
+            0
+        }
+    }
+}
+
+// Search term variants, derived once per scan and compared against every process name
+struct NameMatcher {
+    lower: String,
+    base: String, // Lowercased basename with any executable extension stripped
+    compact: Option<String>, // Lowercased name with spaces removed, when it has any
+}
+
+impl NameMatcher {
+    fn new(process_name: &str) -> Self {
+        let lower = process_name.to_lowercase();
+        let base = strip_executable_extension(basename(&lower)).to_string();
+        let compact = lower.contains(' ').then(|| lower.replace(' ', ""));
+        NameMatcher { lower, base, compact }
+    }
+}
+
+// Final path component of a process name
+fn basename(name: &str) -> &str {
+    name.rsplit('/').next().unwrap_or(name)
+}
+
+// Drop a common executable extension from a basename
+fn strip_executable_extension(name: &str) -> &str {
+    [".exe", ".app", ".bin", ".run"]
+        .iter()
+        .find_map(|ext| name.strip_suffix(ext))
+        .unwrap_or(name)
+}
+
+// Append a string to `out` as a quoted JSON string literal
+fn write_json_string(out: &mut String, value: &str) {
+    out.push('"');
+    for c in value.chars() {
+        match c {
+            '"' => out.push_str("\\\""),
+            '\\' => out.push_str("\\\\"),
+            '\n' => out.push_str("\\n"),
+            '\r' => out.push_str("\\r"),
+            '\t' => out.push_str("\\t"),
+            c if (c as u32) < 0x20 => {
+                let _ = write!(out, "\\u{:04x}", c as u32);
+            }
+            c => out.push(c),
+        }
+    }
+    out.push('"');
+}
+
 // Memory Monitor
 struct MemoryMonitor {
     processes: HashMap<u32, ProcessInfo>,
-    no_color: bool,
+    palette: &'static colors::Palette,
     show_args: bool,
+    // Open /proc/<pid>/stat descriptors, re-read on the next pass in watch mode
+    #[cfg(target_os = "linux")]
+    stat_files: HashMap<u32, std::fs::File>,
+    // How many of those descriptors to keep; zero for a one-shot run, which has no next pass
+    #[cfg(target_os = "linux")]
+    stat_cache_limit: usize,
+    #[cfg(not(target_os = "linux"))]
     system: System,
 }
 
 impl MemoryMonitor {
-    fn new(no_color: bool, show_args: bool) -> Self {
-        let mut system = System::new_all();
-        system.refresh_all();
+    fn new(no_color: bool, show_args: bool, watch: bool) -> Self {
+        // Only the procfs reader keeps descriptors between passes
+        #[cfg(not(target_os = "linux"))]
+        let _ = watch;
         MemoryMonitor {
             processes: HashMap::new(),
-            no_color,
+            palette: if no_color { &colors::PLAIN } else { &colors::COLORED },
             show_args,
-            system,
+            #[cfg(target_os = "linux")]
+            stat_files: HashMap::new(),
+            #[cfg(target_os = "linux")]
+            stat_cache_limit: if watch { procfs::stat_cache_limit() } else { 0 },
+            // Start empty: only process data is needed, and it is loaded on demand
+            #[cfg(not(target_os = "linux"))]
+            system: System::new(),
         }
     }
     
-    // Get all processes using sysinfo crate
-    fn get_all_processes(&mut self) -> Result<(), Box<dyn std::error::Error>> {
-        // Refresh system information
-        self.system.refresh_processes();
-        
+    // Get all processes linked into a forest, returning the PIDs whose name matches the search term
+    fn get_all_processes(&mut self, process_name: &str) -> Result<Vec<u32>, Box<dyn std::error::Error>> {
         // Clear existing processes to avoid duplicates
         self.processes.clear();
         
-        // Iterate through all processes
+        // Derive the search term variants once rather than for every process
+        let target = NameMatcher::new(process_name);
+        
+        // On Linux read procfs directly; elsewhere go through sysinfo
+        #[cfg(target_os = "linux")]
+        let matching_pids = self.get_procfs_processes(&target)?;
+        #[cfg(not(target_os = "linux"))]
+        let matching_pids = self.get_sysinfo_processes(&target);
+        
+        // Hand back a fully linked forest
+        self.link_children();
+        
+        Ok(matching_pids)
+    }
+    
+    // Snapshot processes from /proc/<pid>/stat, one file read per process
+    #[cfg(target_os = "linux")]
+    fn get_procfs_processes(&mut self, target: &NameMatcher) -> Result<Vec<u32>, Box<dyn std::error::Error>> {
+        let pids = procfs::list_pids()?;
+        let mut matching_pids = Vec::new();
+        
+        // Entries go straight into the snapshot as they are read, with no intermediate list
+        let processes = &mut self.processes;
+        processes.reserve(pids.len());
+        procfs::read_processes(&pids, &mut self.stat_files, self.stat_cache_limit, |entry| {
+            if Self::is_process_matching(&entry.stat.name, target) {
+                matching_pids.push(entry.pid);
+            }
+            
+            let proc_info = ProcessInfo::new(entry.pid, entry.stat.name, entry.stat.rss, entry.stat.parent_pid);
+            processes.insert(entry.pid, proc_info);
+        })?;
+        
+        Ok(matching_pids)
+    }
+    
+    // Read command lines only for the processes of a tree that is about to be shown,
+    // instead of for every process on the system
+    #[cfg(target_os = "linux")]
+    fn load_tree_args(&mut self, rows: &[TreeRow]) {
+        if !self.show_args {
+            return;
+        }
+        for &TreeRow { pid, .. } in rows {
+            if let Some(proc_info) = self.processes.get_mut(&pid) {
+                proc_info.args = procfs::read_cmdline(pid).map(String::into_boxed_str);
+            }
+        }
+    }
+    
+    // sysinfo already loaded command lines during the snapshot
+    #[cfg(not(target_os = "linux"))]
+    fn load_tree_args(&mut self, _rows: &[TreeRow]) {}
+    
+    // Snapshot processes using sysinfo crate
+    #[cfg(not(target_os = "linux"))]
+    fn get_sysinfo_processes(&mut self, target: &NameMatcher) -> Vec<u32> {
+        // Refresh only the process attributes we actually display, in a single pass
+        let mut refresh_kind = ProcessRefreshKind::new().with_memory();
+        if self.show_args {
+            refresh_kind = refresh_kind.with_cmd(UpdateKind::OnlyIfNotSet);
+        }
+        self.system.refresh_processes_specifics(refresh_kind);
+        
+        // Iterate through all processes, matching names in the same pass
+        let mut matching_pids = Vec::new();
+        self.processes.reserve(self.system.processes().len());
         for (pid, process) in self.system.processes() {
             let pid_value = pid.as_u32();
             let name = process.name().to_string();
+            if Self::is_process_matching(&name, target) {
+                matching_pids.push(pid_value);
+            }
             let rss = process.memory(); // Already in bytes
             let ppid = process.parent().map(|p| p.as_u32());
             
-            // Get command line arguments if show_args is enabled
-            let args = if self.show_args {
-                process.cmd().join(" ")
-            } else {
-                String::new()
-            };
-            
+            // Join command line arguments only when they are shown and present
             let mut proc_info = ProcessInfo::new(pid_value, name, rss, ppid);
-            if self.show_args && !args.is_empty() {
-                proc_info.args = Some(args);
+            let cmd = process.cmd();
+            if self.show_args && !cmd.is_empty() {
+                proc_info.args = Some(cmd.join(" ").into_boxed_str());
             }
             
             self.processes.insert(pid_value, proc_info);
         }
         
-        Ok(())
+        matching_pids
     }
     
-    // Build process tree starting from root PID
-    fn build_process_tree(&mut self, root_pid: u32) -> Option<ProcessInfo> {
-        if !self.processes.contains_key(&root_pid) {
-            return None;
+    // Link every process to its parent; the snapshot starts with empty children lists
+    fn link_children(&mut self) {
+        // Collect parent-child pairs by walking each parent chain once. A parent that is
+        // still on the current walk would close a cycle (e.g. a corrupted ppid == pid read),
+        // so that link is dropped and the process is orphaned, keeping every traversal O(N)
+        let mut finished: HashMap<u32, bool> = HashMap::with_capacity(self.processes.len()); // false while on the current walk
+        let mut links = Vec::with_capacity(self.processes.len());
+        let mut orphans = Vec::new();
+        let mut path = Vec::new();
+        for &start_pid in self.processes.keys() {
+            let mut pid = start_pid;
+            while !finished.contains_key(&pid) {
+                finished.insert(pid, false);
+                path.push(pid);
+                let Some(parent_pid) = self.processes[&pid].parent_pid.filter(|ppid| self.processes.contains_key(ppid)) else {
+                    break;
+                };
+                if finished.get(&parent_pid) == Some(&false) {
+                    orphans.push(pid);
+                    break;
+                }
+                links.push((parent_pid, pid));
+                pid = parent_pid;
+            }
+            for pid in path.drain(..) {
+                finished.insert(pid, true);
+            }
         }
         
-        // Clear existing children relationships to avoid duplicates
-        for (_, proc_info) in self.processes.iter_mut() {
-            proc_info.children.clear();
+        for pid in orphans {
+            if let Some(proc_info) = self.processes.get_mut(&pid) {
+                proc_info.parent_pid = None;
+            }
         }
-        
-        // Get all processes and their children
-        let pids: Vec<u32> = self.processes.keys().cloned().collect();
-        for pid in pids {
-            if let Some(parent_pid) = self.processes[&pid].parent_pid {
-                if self.processes.contains_key(&parent_pid) {
-                    self.processes.get_mut(&parent_pid).unwrap().add_child(pid);
-                }
+        for (parent_pid, pid) in links {
+            if let Some(parent) = self.processes.get_mut(&parent_pid) {
+                parent.add_child(pid);
             }
         }
-        
-        self.processes.get(&root_pid).cloned()
     }
     
     // Find root processes (processes whose parent is not in the matching list)
     fn find_root_processes(&self, matching_pids: &[u32]) -> Vec<u32> {
         let mut root_pids = Vec::new();
+        let matching_set: HashSet<u32> = matching_pids.iter().copied().collect();
         
         for &pid in matching_pids {
             if let Some(proc_info) = self.processes.get(&pid) {
                 // If parent is not in matching list or parent is 1 (launchd), consider it a root
                 if let Some(parent_pid) = proc_info.parent_pid {
-                    if !matching_pids.contains(&parent_pid) || parent_pid == 1 || !self.processes.contains_key(&parent_pid) {
+                    if !matching_set.contains(&parent_pid) || parent_pid == 1 || !self.processes.contains_key(&parent_pid) {
                         root_pids.push(pid);
                     }
                 } else {
@@ -202,276 +721,236 @@ impl MemoryMonitor {
     }
     
     // Convert bytes to human readable format (MB/GB)
-    fn format_memory(&self, bytes_value: u64) -> String {
-        if bytes_value == 0 {
-            return "0B".to_string();
-        }
-        
-        let mb = bytes_value as f64 / (1024.0 * 1024.0);
-        let gb = mb / 1024.0;
-        
-        if gb >= 1.0 {
-            format!("{:.1}GB", gb)
-        } else {
-            format!("{:.1}MB", mb)
-        }
+    fn format_memory(&self, bytes_value: u64) -> MemoryDisplay {
+        MemoryDisplay { bytes: bytes_value, color: "", reset: "" }
     }
     
     // Get color based on memory usage level
-    fn get_memory_color(&self, _bytes_value: u64, is_max_memory: bool, is_second_max_memory: bool, is_third_max_memory: bool) -> String {
-        if self.no_color {
-            return String::new();
-        }
-        
+    fn get_memory_color(&self, _bytes_value: u64, highlighted: bool) -> &'static str {
         // Use dark gray text with light gray background for top 1-3 memory processes
-        if is_max_memory || is_second_max_memory || is_third_max_memory {
-            // Dark gray text on light gray background
-            return format!("{}{}", colors::DARK_GRAY, colors::BG_LIGHT_GRAY);
+        if highlighted {
+            return self.palette.highlight;
         }
         
         // No special color for non-trophy processes
-        String::new()
+        ""
     }
     
     // Get memory string with color coding
-    fn get_colored_memory_str(&self, bytes_value: u64, is_max_memory: bool, is_second_max_memory: bool, is_third_max_memory: bool) -> String {
-        let color = self.get_memory_color(bytes_value, is_max_memory, is_second_max_memory, is_third_max_memory);
-        let memory_str = self.format_memory(bytes_value);
-        if self.no_color {
-            memory_str
-        } else {
-            format!("{}{}{}", color, memory_str, colors::RESET)
+    fn get_colored_memory_str(&self, bytes_value: u64, highlighted: bool) -> MemoryDisplay {
+        MemoryDisplay {
+            bytes: bytes_value,
+            color: self.get_memory_color(bytes_value, highlighted),
+            reset: self.palette.reset,
         }
     }
     
-    // Calculate column widths for proper alignment
-    fn calculate_column_widths(&self, root: &ProcessInfo) -> (usize, usize) {
-        let mut max_pid_width = 0;
-        let mut max_name_width = 40; // Default minimum width
-        
-        // Collect all processes in the tree
-        let mut all_processes = Vec::new();
-        self.collect_all_processes_in_tree(root, &mut all_processes);
+    // Walk a tree once, depth-first, recording its rows in display order along with the
+    // memory total, top RSS values and column widths needed to format them
+    fn collect_tree_stats(&self, root_pid: u32) -> Option<TreeStats> {
+        if !self.processes.contains_key(&root_pid) {
+            return None;
+        }
         
-        // Find maximum PID width and process name width
-        for proc_info in &all_processes {
-            let pid_str = proc_info.pid.to_string();
-            max_pid_width = max_pid_width.max(pid_str.len());
-            
-            // Calculate actual display name width
-            let display_name = if proc_info.name.len() > 40 {
-                format!("{}...", &proc_info.name[..37])
-            } else {
-                proc_info.name.clone()
+        let mut stats = TreeStats {
+            rows: Vec::new(),
+            total_memory: 0,
+            top_rss: [0; 3],
+            pid_width: 0,
+            name_width: 40, // Default minimum width
+        };
+        let mut stack = vec![TreeRow { pid: root_pid, depth: 0, is_last: false }];
+        while let Some(row) = stack.pop() {
+            let Some(proc_info) = self.processes.get(&row.pid) else {
+                continue;
             };
-            max_name_width = max_name_width.max(display_name.len());
+            stats.total_memory += proc_info.rss;
+            
+            // Keep the three largest distinct RSS values as we go
+            let rss = proc_info.rss;
+            let top = &mut stats.top_rss;
+            if rss > top[0] {
+                *top = [rss, top[0], top[1]];
+            } else if rss < top[0] && rss > top[1] {
+                *top = [top[0], rss, top[1]];
+            } else if rss < top[1] && rss > top[2] {
+                top[2] = rss;
+            }
+            
+            let pid_width = proc_info.pid.checked_ilog10().unwrap_or(0) as usize + 1;
+            stats.pid_width = stats.pid_width.max(pid_width);
+            
+            // Names longer than 40 are displayed truncated to 37 plus "..."
+            stats.name_width = stats.name_width.max(proc_info.name.len().min(40));
+            
+            // Push children in reverse so they pop in their original order
+            let child_count = proc_info.children.len();
+            for (i, &child_pid) in proc_info.children.iter().enumerate().rev() {
+                stack.push(TreeRow { pid: child_pid, depth: row.depth + 1, is_last: i == child_count - 1 });
+            }
+            stats.rows.push(row);
         }
         
-        (max_pid_width, max_name_width)
+        Some(stats)
     }
     
-    // Collect all processes in the tree for width calculation
-    fn collect_all_processes_in_tree(&self, root: &ProcessInfo, processes: &mut Vec<ProcessInfo>) {
-        processes.push(root.clone());
-        for &child_pid in &root.children {
-            if let Some(child) = self.processes.get(&child_pid) {
-                self.collect_all_processes_in_tree(child, processes);
-            }
+    // Print process tree with memory information from the rows recorded by collect_tree_stats
+    fn print_tree(&self, out: &mut String, stats: &TreeStats) -> fmt::Result {
+        for row in &stats.rows {
+            self.write_tree_row(out, &self.processes[&row.pid], row, stats)?;
         }
+        
+        Ok(())
     }
     
-    // Print process tree with memory information
-    fn print_tree(&self, root: &ProcessInfo, level: usize, is_last: bool, total_memory: u64, pid_width: usize, name_width: usize) {
+    // Format a single tree row into the frame
+    fn write_tree_row(&self, out: &mut String, root: &ProcessInfo, row: &TreeRow, stats: &TreeStats) -> fmt::Result {
+        let TreeStats { pid_width, name_width, .. } = *stats;
+        let memory_rank = stats.memory_rank(root.rss);
+        
         // Format the current node with colors
-        let memory_str = self.get_colored_memory_str(root.rss, root.is_max_memory, root.is_second_max_memory, root.is_third_max_memory);
+        let memory_str = self.get_colored_memory_str(root.rss, memory_rank > 0);
         
-        // Calculate and format overall percentage if total_memory is provided
-        let _percentage_str = if total_memory > 0 {
-            let percentage = (root.rss as f64 / total_memory as f64) * 100.0;
-            format!(" ({:.1}%)", percentage)
-        } else {
-            String::new()
+        // Add emoji for memory ranking
+        let rank_emoji = match memory_rank {
+            1 => "🥇",
+            2 => "🥈",
+            3 => "🥉",
+            _ => "",
         };
         
-        // Create compact tree structure
-        let tree_prefix = if level > 0 {
-            let mut prefix = String::new();
-            for _ in 0..(level - 1) {
-                prefix.push_str("  ");
+        // Write the compact tree structure straight into the frame
+        if row.depth > 0 {
+            for _ in 1..row.depth {
+                out.push_str("  ");
             }
-            prefix.push_str(if is_last { "└─ " } else { "├─ " });
-            prefix
-        } else {
-            String::new()
-        };
-        
-        // No PID coloring for cleaner output
-        let _pid_color = "";
+            out.push_str(if row.is_last { "└─ " } else { "├─ " });
+        }
         
-        // Add emoji for memory ranking
-        let rank_emoji = if root.is_max_memory {
-            "🥇"
-        } else if root.is_second_max_memory {
-            "🥈"
-        } else if root.is_third_max_memory {
-            "🥉"
-        } else {
-            ""
-        };
+        // Display green dot emoji before PID if show_args is enabled
+        if self.show_args {
+            out.push('🟢');
+        }
         
-        // Truncate or pad process name to dynamic width
-        let display_name = if root.name.len() > name_width {
+        // Print process info with dynamic column widths, truncating or padding the name in place
+        if root.name.len() > name_width {
             if name_width > 3 {
-                format!("{}...", &root.name[..name_width-3])
+                write!(out, "{:width$} {}... {}", root.pid, &root.name[..name_width-3], memory_str, width = pid_width)?;
             } else {
-                "...".to_string()
+                write!(out, "{:width$} ... {}", root.pid, memory_str, width = pid_width)?;
             }
         } else {
-            format!("{:width$}", root.name, width = name_width)
-        };
-
-        // Print process info with dynamic column widths
-        print!("{}", tree_prefix);
-        
-        // Display green dot emoji before PID if show_args is enabled
-        if self.show_args {
-            print!("🟢");
+            write!(out, "{:width$} {:name_width$} {}", root.pid, root.name, memory_str, width = pid_width)?;
         }
         
-        print!("{:width$} {} {}", root.pid, display_name, memory_str, width = pid_width);
-        
         // Display arguments if available
         if let Some(ref args) = root.args {
-            print!(" 🔍{}", args);
+            write!(out, " 🔍{}", args)?;
         }
         
         // Display the rank emoji
-        print!("{}", rank_emoji);
-        
-        // Print new line
-        println!();
+        out.push_str(rank_emoji);
+        out.push('\n');
         
-        // Print children
-        let child_count = root.children.len();
-        for (i, child_pid) in root.children.iter().enumerate() {
+        Ok(())
+    }
+    
+    // Write a process and its descendants as a JSON object
+    fn write_json_tree(&self, root: &ProcessInfo, out: &mut String) {
+        let _ = write!(out, "{{\"pid\":{},\"name\":", root.pid);
+        write_json_string(out, &root.name);
+        let _ = write!(out, ",\"rss\":{},\"args\":", root.rss);
+        match root.args {
+            Some(ref args) => write_json_string(out, args),
+            None => out.push_str("null"),
+        }
+        out.push_str(",\"children\":[");
+        // Separate only elements actually written, so a missing child never leaves a stray comma
+        let mut first = true;
+        for child_pid in &root.children {
             if let Some(child) = self.processes.get(child_pid) {
-                self.print_tree(child, level + 1, i == child_count - 1, total_memory, pid_width, name_width);
+                if !first {
+                    out.push(',');
+                }
+                first = false;
+                self.write_json_tree(child, out);
             }
         }
+        out.push_str("]}");
     }
     
-    // Main analysis function
-    fn analyze_process_tree(&mut self, process_name: &str) -> Result<bool, Box<dyn std::error::Error>> {
-        let search_msg = if self.no_color {
-            format!("Searching: {}", process_name)
-        } else {
-            format!("Searching:{} {}{}", 
-                    colors::CYAN, process_name, colors::RESET)
-        };
-        println!("{}", search_msg);
+    // Machine-readable analysis: print all matching trees as one JSON document
+    fn analyze_process_tree_json(&mut self, process_name: &str, out: &mut String) -> Result<bool, Box<dyn std::error::Error>> {
+        let matching_pids = self.get_all_processes(process_name)?;
+        let root_pids = self.find_root_processes(&matching_pids);
         
-        // Get all processes
-        self.get_all_processes()?;
+        self.write_json_forest(process_name, &root_pids, out);
         
-        // Find matching processes with improved matching logic
-        let matching_pids: Vec<u32> = self.processes
-            .iter()
-            .filter(|(_, proc_info)| {
-                self.is_process_matching(&proc_info.name, process_name)
-            })
-            .map(|(&pid, _)| pid)
-            .collect();
+        Ok(!root_pids.is_empty())
+    }
+    
+    // Write the given trees of the current snapshot as one JSON document
+    fn write_json_forest(&mut self, process_name: &str, root_pids: &[u32], out: &mut String) {
+        out.push_str("{\"process_name\":");
+        write_json_string(out, process_name);
+        out.push_str(",\"trees\":[");
+        let mut first = true;
+        for &root_pid in root_pids {
+            if let Some(stats) = self.collect_tree_stats(root_pid) {
+                self.load_tree_args(&stats.rows);
+                if !first {
+                    out.push(',');
+                }
+                first = false;
+                let _ = write!(out, "{{\"process_count\":{},\"total_memory\":{},\"root\":", stats.rows.len(), stats.total_memory);
+                self.write_json_tree(&self.processes[&root_pid], out);
+                out.push('}');
+            }
+        }
+        out.push_str("]}\n");
+    }
+    
+    // Main analysis function
+    fn analyze_process_tree(&mut self, process_name: &str, out: &mut String) -> Result<bool, Box<dyn std::error::Error>> {
+        let palette = self.palette;
+        writeln!(out, "Searching:{} {}{}", palette.cyan, process_name, palette.reset)?;
+        
+        // Get all processes, already linked into a forest, and the matching PIDs
+        let matching_pids = self.get_all_processes(process_name)?;
         
         if matching_pids.is_empty() {
-            let not_found_msg = if self.no_color {
-                format!("No processes found matching '{}'", process_name)
-            } else {
-                format!("No processes found matching '{}'{}", 
-                        process_name, colors::RESET)
-            };
-            println!("{}", not_found_msg);
+            writeln!(out, "No processes found matching '{}'{}", process_name, palette.reset)?;
             return Ok(false);
         }
         
-        let found_msg = if self.no_color {
-            format!("Found {} procs", matching_pids.len())
-        } else {
-            format!("Found {} procs{}", 
-                    matching_pids.len(), colors::RESET)
-        };
-        println!("{}", found_msg);
+        writeln!(out, "Found {} procs{}", matching_pids.len(), palette.reset)?;
         
         // Find root processes
         let root_pids = self.find_root_processes(&matching_pids);
         
         if root_pids.is_empty() {
-            let no_root_msg = if self.no_color {
-                "No root processes found".to_string()
-            } else {
-                "No root processes found".to_string()
-            };
-            println!("{}", no_root_msg);
+            writeln!(out, "No root processes found")?;
             return Ok(false);
         }
         
-        let root_msg = if self.no_color {
-            format!("Found {} trees", root_pids.len())
-        } else {
-            format!("Found {} trees{}", 
-                    root_pids.len(), colors::RESET)
-        };
-        println!("{}", root_msg);
+        writeln!(out, "Found {} trees{}", root_pids.len(), palette.reset)?;
         
         // Analyze each process tree
         for (i, &root_pid) in root_pids.iter().enumerate() {
             if i > 0 {
-                if self.no_color {
-                    println!("\n{}", "=".repeat(60));
-                } else {
-                    println!();
-                }
+                out.push_str(palette.tree_separator);
             }
             
-            // Build and print tree
-            if let Some(root_process) = self.build_process_tree(root_pid) {
-                // Collect all RSS values in this tree and find max, second max, and third max
-                let all_rss_in_tree = self.collect_all_rss_in_tree(&root_process);
-                
-                // Calculate total memory for this tree
-                let total_memory = self.calculate_total_memory(&root_process);
+            // Gather the tree's members, totals and column widths in one walk, then print it
+            if let Some(stats) = self.collect_tree_stats(root_pid) {
+                self.load_tree_args(&stats.rows);
+                let process_count = stats.rows.len();
+                let total_memory = stats.total_memory;
                 
-                // Mark processes with max, second max, and third max memory
-                if !all_rss_in_tree.is_empty() {
-                    let tree_max_rss = *all_rss_in_tree.iter().max().unwrap();
-                    let filtered_rss: Vec<u64> = all_rss_in_tree.iter().filter(|&&rss| rss != tree_max_rss).cloned().collect();
-                    let tree_second_max_rss = if !filtered_rss.is_empty() {
-                        *filtered_rss.iter().max().unwrap()
-                    } else {
-                        0
-                    };
-                    
-                    // Find third max
-                    let third_filtered_rss: Vec<u64> = filtered_rss.iter().filter(|&&rss| rss != tree_second_max_rss).cloned().collect();
-                    let tree_third_max_rss = if !third_filtered_rss.is_empty() {
-                        *third_filtered_rss.iter().max().unwrap()
-                    } else {
-                        0
-                    };
-                    
-                    // Mark processes with max, second max, and third max memory
-                    self.mark_memory_highlights_in_tree(root_pid, tree_max_rss, tree_second_max_rss, tree_third_max_rss);
-                }
-                
-                // Get the updated root process after marking highlights
-                if let Some(updated_root_process) = self.processes.get(&root_pid).cloned() {
-                    // Calculate column widths for proper alignment
-                    let (pid_width, name_width) = self.calculate_column_widths(&updated_root_process);
-                    self.print_tree(&updated_root_process, 0, false, total_memory, pid_width, name_width);
-                }
+                // Format the recorded rows; highlights come from the top RSS values gathered in the same walk
+                self.print_tree(out, &stats)?;
                 
                 // Print summary
-                let process_count = self.count_processes(&root_process);
-                
                 // Calculate and print average memory
                 let average_memory = if process_count > 0 {
                     total_memory / process_count as u64
@@ -479,61 +958,47 @@ impl MemoryMonitor {
                     0
                 };
                 
-                // For summary, we need to check if this tree contains top 3 memory processes
-                let all_rss_in_tree = self.collect_all_rss_in_tree(&root_process);
-                let tree_max_rss = *all_rss_in_tree.iter().max().unwrap_or(&0);
-                let tree_second_max_rss = if all_rss_in_tree.len() > 1 {
-                    *all_rss_in_tree.iter().filter(|&&rss| rss != tree_max_rss).max().unwrap_or(&0)
-                } else { 0 };
-                let tree_third_max_rss = if all_rss_in_tree.len() > 2 {
-                    *all_rss_in_tree.iter().filter(|&&rss| rss != tree_max_rss && rss != tree_second_max_rss).max().unwrap_or(&0)
-                } else { 0 };
-                
-                let has_top_memory = tree_max_rss > 0 || tree_second_max_rss > 0 || tree_third_max_rss > 0;
+                // The tree has a highlighted max process exactly when any RSS is non-zero,
+                // which the total already tells us without re-collecting the tree
+                let has_top_memory = total_memory > 0;
                 
+                // get_colored_memory_str already falls back to plain text when colors are off
                 let avg_memory_str = if has_top_memory {
-                    self.get_colored_memory_str(average_memory, true, true, true)
+                    self.get_colored_memory_str(average_memory, true)
                 } else {
                     self.format_memory(average_memory)
                 };
                 let total_memory_str = if has_top_memory {
-                    self.get_colored_memory_str(total_memory, true, true, true)
+                    self.get_colored_memory_str(total_memory, true)
                 } else {
                     self.format_memory(total_memory)
                 };
                 
-                let summary = if self.no_color {
-                    format!("{} procs | {} avg | {} total", 
-                            process_count, 
-                            self.format_memory(average_memory), 
-                            self.format_memory(total_memory))
-                } else {
-                    format!("{} procs | {} avg | {} total", 
-                            process_count,
-                            avg_memory_str, total_memory_str)
-                };
-                println!("{}", summary);
+                writeln!(out, "{} procs | {} avg | {} total", 
+                         process_count,
+                         avg_memory_str, total_memory_str)?;
             } else {
-                let error_msg = if self.no_color {
-                    format!("Could not build process tree for PID {}", root_pid)
-                } else {
-                    format!("Could not build process tree for PID {}", root_pid)
-                };
-                println!("{}", error_msg);
+                writeln!(out, "Could not build process tree for PID {}", root_pid)?;
             }
         }
         
         Ok(true)
     }
     
-    // Improved process name matching logic
-    fn is_process_matching(&self, proc_name: &str, target_name: &str) -> bool {
-        let proc_name_lower = proc_name.to_lowercase();
-        let target_name_lower = target_name.to_lowercase();
+    // Improved process name matching logic against a pre-derived search term
+    fn is_process_matching(proc_name: &str, target: &NameMatcher) -> bool {
+        // Most process names are already lowercase ASCII; only allocate when lowercasing changes something
+        let lowered = if proc_name.bytes().all(|b| b.is_ascii() && !b.is_ascii_uppercase()) {
+            Cow::Borrowed(proc_name)
+        } else {
+            Cow::Owned(proc_name.to_lowercase())
+        };
+        let proc_name_lower: &str = &lowered;
+        let target_name_lower = target.lower.as_str();
         
         // Handle truncated process names (common on macOS with ps -c)
         // If target name is being searched and process name might be truncated
-        if proc_name_lower.len() >= 15 && target_name_lower.starts_with(&proc_name_lower) {
+        if proc_name_lower.len() >= 15 && target_name_lower.starts_with(proc_name_lower) {
             return true;
         }
         
@@ -548,134 +1013,250 @@ impl MemoryMonitor {
         }
         
         // Check if target name starts with process name (for truncated names)
-        if target_name_lower.starts_with(&proc_name_lower) {
+        if target_name_lower.starts_with(proc_name_lower) {
             return true;
         }
         
         // Check if process name starts with target name (for partial matching)
-        if proc_name_lower.starts_with(&target_name_lower) {
+        if proc_name_lower.starts_with(target_name_lower) {
             return true;
         }
         
-        // Extract basename from process name if it contains a path
-        let proc_basename = if proc_name_lower.contains('/') {
-            proc_name_lower.split('/').last().unwrap_or(&proc_name_lower).to_string()
-        } else {
-            proc_name_lower.clone()
-        };
-        
-        // Extract basename from target name if it contains a path
-        let target_basename = if target_name_lower.contains('/') {
-            target_name_lower.split('/').last().unwrap_or(&target_name_lower).to_string()
-        } else {
-            target_name_lower.clone()
-        };
-        
-        // Handle common executable extensions
-        let base_proc = if proc_basename.ends_with(".exe") || proc_basename.ends_with(".app") || 
-                          proc_basename.ends_with(".bin") || proc_basename.ends_with(".run") {
-            proc_basename[..proc_basename.len()-4].to_string()
-        } else {
-            proc_basename
-        };
-        
-        let base_target = if target_basename.ends_with(".exe") || target_basename.ends_with(".app") || 
-                            target_basename.ends_with(".bin") || target_basename.ends_with(".run") {
-            target_basename[..target_basename.len()-4].to_string()
-        } else {
-            target_basename
-        };
-        
-        if base_proc == base_target {
+        // Compare basenames with common executable extensions stripped
+        if strip_executable_extension(basename(proc_name_lower)) == target.base {
             return true;
         }
         
         // Check for common macOS app naming patterns
         // Some apps have process names like "App Name" when app is "AppName"
-        if target_name.contains(' ') {
-            let compact_name = target_name.replace(' ', "").to_lowercase();
-            if proc_name_lower == compact_name {
-                return true;
-            }
+        if target.compact.as_deref() == Some(proc_name_lower) {
+            return true;
         }
         
         false
     }
+}
+
+fn main() -> Result<(), Box<dyn std::error::Error>> {
+    let args = Args::parse();
     
-    // Count total number of processes in tree
-    fn count_processes(&self, root: &ProcessInfo) -> usize {
-        let mut count = 1; // Root itself
-        for child_pid in &root.children {
-            if let Some(child) = self.processes.get(child_pid) {
-                count += self.count_processes(child);
+    // Create the memory monitor once; watch mode reuses it for every refresh
+    let mut monitor = MemoryMonitor::new(!colors::should_use_colors(args.no_color), args.show_args, args.watch.is_some());
+    
+    // Each pass is rendered into one buffer and written to the terminal in a single call
+    let mut frame = String::new();
+    let mut stdout = io::stdout().lock();
+    
+    if let Some(interval) = args.watch {
+        let interval = Duration::from_secs(interval);
+        let mut screen = String::new();
+        // Repaint in place only on a terminal; logs and pipes get each frame as plain text
+        let palette = monitor.palette;
+        let repaint_in_place = !args.json && stdout.is_terminal();
+        if repaint_in_place {
+            // Clear once; later frames are painted over the previous one in place
+            stdout.write_all(palette.clear_screen.as_bytes())?;
+        }
+        loop {
+            frame.clear();
+            run_analysis(&mut monitor, &args, &mut frame)?;
+            if repaint_in_place {
+                repaint(&frame, &mut screen, palette);
+                stdout.write_all(screen.as_bytes())?;
+            } else {
+                stdout.write_all(frame.as_bytes())?;
             }
+            stdout.flush()?;
+            thread::sleep(interval);
         }
-        count
     }
     
-    // Calculate total RSS memory for a process tree
-    fn calculate_total_memory(&self, root: &ProcessInfo) -> u64 {
-        let mut total_memory = root.rss; // Root's memory
-        for child_pid in &root.children {
-            if let Some(child) = self.processes.get(child_pid) {
-                total_memory += self.calculate_total_memory(child);
-            }
+    let success = run_analysis(&mut monitor, &args, &mut frame)?;
+    stdout.write_all(frame.as_bytes())?;
+    stdout.flush()?;
+    
+    if !success {
+        std::process::exit(1);
+    }
+    
+    Ok(())
+}
+
+// Run one analysis pass in the requested output format
+fn run_analysis(monitor: &mut MemoryMonitor, args: &Args, out: &mut String) -> Result<bool, Box<dyn std::error::Error>> {
+    if args.json {
+        monitor.analyze_process_tree_json(&args.process_name, out)
+    } else {
+        monitor.analyze_process_tree(&args.process_name, out)
+    }
+}
+
+// Build the escape sequence that paints `frame` over the previous one: cursor home,
+// each line followed by clear-to-end-of-line, then clear whatever remains below
+fn repaint(frame: &str, screen: &mut String, palette: &colors::Palette) {
+    screen.clear();
+    screen.push_str(palette.cursor_home);
+    for line in frame.lines() {
+        screen.push_str(line);
+        screen.push_str(palette.clear_line);
+        screen.push('\n');
+    }
+    screen.push_str(palette.clear_below);
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    
+    // Snapshot built from (pid, name, rss, parent) tuples and linked like a real scan
+    fn monitor_with(processes: &[(u32, &str, u64, Option<u32>)]) -> MemoryMonitor {
+        let mut monitor = MemoryMonitor::new(true, false, false);
+        for &(pid, name, rss, parent_pid) in processes {
+            monitor.processes.insert(pid, ProcessInfo::new(pid, name.to_string(), rss, parent_pid));
         }
-        total_memory
+        monitor.link_children();
+        monitor
     }
     
-    // Collect all RSS values from processes in the tree
-    fn collect_all_rss_in_tree(&self, root: &ProcessInfo) -> Vec<u64> {
-        let mut rss_values = vec![root.rss]; // Root's RSS
-        for child_pid in &root.children {
-            if let Some(child) = self.processes.get(child_pid) {
-                rss_values.extend(self.collect_all_rss_in_tree(child));
+    fn json_string(value: &str) -> String {
+        let mut out = String::new();
+        write_json_string(&mut out, value);
+        out
+    }
+    
+    // Every process must hang off exactly one forest root, and walking each root must finish
+    fn assert_forest(monitor: &MemoryMonitor) {
+        let roots: Vec<u32> = monitor.processes
+            .values()
+            .filter(|proc_info| proc_info.parent_pid.is_none_or(|ppid| !monitor.processes.contains_key(&ppid)))
+            .map(|proc_info| proc_info.pid)
+            .collect();
+        let mut seen: HashMap<u32, usize> = HashMap::new();
+        for &root_pid in &roots {
+            let stats = monitor.collect_tree_stats(root_pid).unwrap();
+            for row in &stats.rows {
+                *seen.entry(row.pid).or_default() += 1;
             }
         }
-        rss_values
+        for &pid in monitor.processes.keys() {
+            assert_eq!(seen.get(&pid), Some(&1), "pid {} reached {:?} times from roots {:?}", pid, seen.get(&pid), roots);
+        }
+        
+        // The roots memon itself picks must terminate too, even when every process matches
+        let all_pids: Vec<u32> = monitor.processes.keys().copied().collect();
+        for root_pid in monitor.find_root_processes(&all_pids) {
+            let stats = monitor.collect_tree_stats(root_pid).unwrap();
+            assert!(stats.rows.len() <= monitor.processes.len());
+        }
+    }
+    
+    #[test]
+    fn self_parent_is_orphaned() {
+        let monitor = monitor_with(&[(5, "loop", 100, Some(5)), (6, "child", 100, Some(5))]);
+        assert_eq!(monitor.processes[&5].parent_pid, None);
+        assert_eq!(monitor.processes[&5].children, vec![6]);
+        assert_forest(&monitor);
+    }
+    
+    #[test]
+    fn two_cycle_is_broken_once() {
+        let monitor = monitor_with(&[(1, "init", 100, Some(5)), (5, "app", 200, Some(1)), (6, "app", 300, Some(5))]);
+        let orphans = monitor.processes.values().filter(|proc_info| proc_info.parent_pid.is_none()).count();
+        assert_eq!(orphans, 1);
+        assert_forest(&monitor);
+    }
+    
+    #[test]
+    fn longer_cycle_with_branches_is_broken_once() {
+        let monitor = monitor_with(&[
+            (10, "a", 100, Some(13)),
+            (11, "b", 100, Some(10)),
+            (12, "c", 100, Some(11)),
+            (13, "d", 100, Some(12)),
+            (20, "branch", 100, Some(12)),
+            (21, "leaf", 100, Some(20)),
+            (30, "unrelated", 100, Some(1)),
+        ]);
+        let orphans: Vec<u32> = monitor.processes
+            .values()
+            .filter(|proc_info| proc_info.parent_pid.is_none())
+            .map(|proc_info| proc_info.pid)
+            .collect();
+        assert_eq!(orphans.len(), 1);
+        assert!([10, 11, 12, 13].contains(&orphans[0]));
+        assert_forest(&monitor);
+    }
+    
+    #[test]
+    fn acyclic_snapshot_keeps_every_link() {
+        let monitor = monitor_with(&[(1, "init", 100, None), (2, "a", 100, Some(1)), (3, "b", 100, Some(2)), (4, "c", 100, Some(1))]);
+        assert!(monitor.processes.values().filter(|proc_info| proc_info.pid != 1).all(|proc_info| proc_info.parent_pid.is_some()));
+        assert_forest(&monitor);
     }
     
-    // Mark processes with max, second max, and third max memory in the tree
-    fn mark_memory_highlights_in_tree(&mut self, root_pid: u32, max_rss: u64, second_max_rss: u64, third_max_rss: u64) {
-        // Create a list of all process IDs in the tree to avoid borrowing issues
-        let mut process_ids = Vec::new();
-        self.collect_process_ids_in_tree(root_pid, &mut process_ids);
+    #[test]
+    fn plain_repaint_emits_no_escape_sequences() {
+        let frame = "Searching: app\nFound 1 procs\n";
+        let mut screen = String::new();
+        repaint(frame, &mut screen, &colors::PLAIN);
+        assert_eq!(screen, frame);
         
-        // Mark processes with max, second max, and third max memory
-        for pid in process_ids {
-            if let Some(proc_info) = self.processes.get_mut(&pid) {
-                if proc_info.rss == max_rss {
-                    proc_info.is_max_memory = true;
-                } else if proc_info.rss == second_max_rss && second_max_rss > 0 {
-                    proc_info.is_second_max_memory = true;
-                } else if proc_info.rss == third_max_rss && third_max_rss > 0 {
-                    proc_info.is_third_max_memory = true;
-                }
-            }
-        }
+        repaint(frame, &mut screen, &colors::COLORED);
+        assert_eq!(screen, "\x1b[HSearching: app\x1b[K\nFound 1 procs\x1b[K\n\x1b[J");
     }
     
-    // Collect all process IDs in the tree
-    fn collect_process_ids_in_tree(&self, root_pid: u32, process_ids: &mut Vec<u32>) {
-        process_ids.push(root_pid);
-        if let Some(proc_info) = self.processes.get(&root_pid) {
-            for child_pid in &proc_info.children {
-                self.collect_process_ids_in_tree(*child_pid, process_ids);
-            }
-        }
+    #[test]
+    fn json_string_escapes_quotes_backslashes_and_control_characters() {
+        assert_eq!(json_string(r#"a"b\c"#), r#""a\"b\\c""#);
+        assert_eq!(json_string("tab\tnl\ncr\r"), r#""tab\tnl\ncr\r""#);
+        assert_eq!(json_string("\u{0}\u{1f}\u{7f}"), "\"\\u0000\\u001f\u{7f}\"");
+        assert_eq!(json_string("héllo 进程 🦀"), "\"héllo 进程 🦀\"");
     }
-}
-
-fn main() -> Result<(), Box<dyn std::error::Error>> {
-    let args = Args::parse();
     
-    // Create memory monitor and analyze
-    let mut monitor = MemoryMonitor::new(!colors::should_use_colors(args.no_color), args.show_args);
-    let success = monitor.analyze_process_tree(&args.process_name)?;
+    #[test]
+    fn json_string_round_trips_through_a_parser() {
+        for name in ["plain", "quote\"inside", "back\\slash", "ctl\u{1}\u{8}\u{c}", "日本語 name", ") (weird) name)"] {
+            let parsed: String = serde_json::from_str(&json_string(name)).unwrap();
+            assert_eq!(parsed, name);
+        }
+    }
     
-    if !success {
-        std::process::exit(1);
+    #[test]
+    fn json_forest_with_two_roots_and_nesting_parses() {
+        let mut monitor = monitor_with(&[
+            (10, "app\"one", 1024, Some(1)),
+            (11, "app\\child", 2048, Some(10)),
+            (12, "app\u{2}grandchild", 4096, Some(11)),
+            (20, "app two", 512, Some(1)),
+        ]);
+        let mut out = String::new();
+        monitor.write_json_forest("app", &[10, 20], &mut out);
+        
+        let doc: serde_json::Value = serde_json::from_str(&out).unwrap();
+        assert_eq!(doc["process_name"], "app");
+        let trees = doc["trees"].as_array().unwrap();
+        assert_eq!(trees.len(), 2);
+        assert_eq!(trees[0]["process_count"], 3);
+        assert_eq!(trees[0]["total_memory"], 1024 + 2048 + 4096);
+        assert_eq!(trees[0]["root"]["name"], "app\"one");
+        let child = &trees[0]["root"]["children"][0];
+        assert_eq!(child["name"], "app\\child");
+        assert_eq!(child["children"][0]["name"], "app\u{2}grandchild");
+        assert_eq!(trees[1]["root"]["pid"], 20);
+        assert_eq!(trees[1]["root"]["args"], serde_json::Value::Null);
     }
     
-    Ok(())
-}
\ No newline at end of file
+    #[test]
+    fn json_forest_skips_missing_entries_without_stray_commas() {
+        let mut monitor = monitor_with(&[(10, "app", 1024, None), (11, "app", 2048, Some(10)), (20, "app", 512, None)]);
+        // A child that vanished after linking, listed first
+        monitor.processes.get_mut(&10).unwrap().children.insert(0, 99);
+        let mut out = String::new();
+        monitor.write_json_forest("app", &[99, 10, 20], &mut out);
+        
+        let doc: serde_json::Value = serde_json::from_str(&out).unwrap();
+        let trees = doc["trees"].as_array().unwrap();
+        assert_eq!(trees.len(), 2);
+        assert_eq!(trees[0]["root"]["children"].as_array().unwrap().len(), 1);
+    }
+}